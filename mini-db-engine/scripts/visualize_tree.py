@@ -6,6 +6,7 @@ Reads binary database files from MiniDB and visualizes the tree structure as ima
 This script parses the binary format directly without requiring Go code.
 """
 
+import mmap
 import struct
 import sys
 import os
@@ -15,6 +16,7 @@ try:
     import matplotlib.pyplot as plt
     import matplotlib.patches as mpatches
     from matplotlib.patches import FancyBboxPatch, FancyArrowPatch
+    from matplotlib.collections import LineCollection, PatchCollection
     HAS_MATPLOTLIB = True
 except ImportError:
     HAS_MATPLOTLIB = False
@@ -29,6 +31,14 @@ PAGE_HEADER_SIZE = 56
 # Meta data starts right after LSN (offset 49)
 META_DATA_OFFSET = 49
 DEFAULT_PAGE_SIZE = 4096
+# Above this many pages the file is mapped with MADV_RANDOM: the tree walk
+# prefetches exactly the pages it needs, so kernel readahead is wasted IO
+RANDOM_ACCESS_MIN_PAGES = 256
+# Trees with more pages than this are written as text: the image would be
+# unreadable and matplotlib would spend most of the run drawing it
+MAX_RENDER_PAGES = 2000
+# Number of leaf values shown per node in the image
+LEAF_VALUES_SHOWN = 3
 
 # Page types
 PAGE_TYPE_META = 0
@@ -41,8 +51,33 @@ COLUMN_TYPE_STRING = 1
 COLUMN_TYPE_FLOAT = 2
 COLUMN_TYPE_BOOL = 3
 
+# Page header layout: PageID, ParentPage, PrevPage, NextPage, PageType,
+# KeyCount, FreeSpace, Padding(4, skipped), LSN
+_HEADER_STRUCT = struct.Struct('>QQQQBHH4xQ')
+
+# Fixed-size big-endian primitives. Struct.unpack_from reads in place and is
+# faster than int.from_bytes(data[a:b], ...) even though it returns a tuple.
+_U16 = struct.Struct('>H')
+_U32 = struct.Struct('>I')
+_U64 = struct.Struct('>Q')
+_I64 = struct.Struct('>q')
+_F64 = struct.Struct('>d')
+
+# Bulk child-id readers keyed by child count (pages share the tree's fanout)
+_CHILD_IDS_STRUCTS: Dict[int, struct.Struct] = {}
+
+
+def _child_ids_struct(count: int) -> struct.Struct:
+    """Return a cached Struct that unpacks `count` big-endian uint64 child ids."""
+    s = _CHILD_IDS_STRUCTS.get(count)
+    if s is None:
+        s = _CHILD_IDS_STRUCTS[count] = struct.Struct(f'>{count}Q')
+    return s
+
 
 class Column:
+    __slots__ = ('type', 'value')
+
     def __init__(self, col_type: int, value: Any):
         self.type = col_type
         self.value = value
@@ -51,107 +86,220 @@ class Column:
         return str(self.value)
 
 
-class CompositeKey:
-    def __init__(self, values: List[Column]):
+class _ColumnArrays:
+    """Columns stored as parallel arrays: one type tag byte and one raw value per column.
+
+    Column objects are only built on demand via `columns`.
+    """
+    __slots__ = ('types', 'values')
+
+    def __init__(self, types: bytes, values: List[Any]):
+        self.types = types
         self.values = values
 
+    @property
+    def columns(self) -> List[Column]:
+        return [Column(t, v) for t, v in zip(self.types, self.values)]
+
+
+class CompositeKey(_ColumnArrays):
+    __slots__ = ()
+
     def __str__(self):
         return "(" + ", ".join(str(v) for v in self.values) + ")"
 
 
-class Record:
-    def __init__(self, columns: List[Column]):
-        self.columns = columns
+class Record(_ColumnArrays):
+    __slots__ = ()
 
     def __str__(self):
-        return "{" + ", ".join(str(c) for c in self.columns) + "}"
+        return "{" + ", ".join(str(v) for v in self.values) + "}"
 
 
 class PageHeader:
     def __init__(self, data: bytes):
         # Read header fields in big-endian format (matching Go binary.BigEndian)
-        offset = 0
-        self.page_id = struct.unpack('>Q', data[offset:offset+8])[0]
-        offset += 8
-        self.parent_page = struct.unpack('>Q', data[offset:offset+8])[0]
-        offset += 8
-        self.prev_page = struct.unpack('>Q', data[offset:offset+8])[0]
-        offset += 8
-        self.next_page = struct.unpack('>Q', data[offset:offset+8])[0]
-        offset += 8
-        self.page_type = struct.unpack('>B', data[offset:offset+1])[0]
+        (self.page_id, self.parent_page, self.prev_page, self.next_page,
+         self.page_type, self.key_count, self.free_space,
+         self.lsn) = _HEADER_STRUCT.unpack_from(data, 0)
+
+
+def _read_columns(data: bytes, offset: int, count: int) -> Tuple[bytes, List[Any], int]:
+    """Read `count` consecutive columns starting at offset. Returns (types, values, new_offset).
+
+    This is the hot path of page parsing, so the per-column dispatch is inlined
+    and the struct readers and data length are bound to locals once per call.
+    """
+    data_len = len(data)
+    unpack_i64 = _I64.unpack_from
+    unpack_u32 = _U32.unpack_from
+    unpack_f64 = _F64.unpack_from
+
+    # Every column takes at least 2 bytes; reject a corrupt count before
+    # sizing the type array from it
+    if offset + 2 * count > data_len:
+        raise ValueError(f"Insufficient data to read {count} columns at offset {offset}")
+
+    types = bytearray(count)
+    values = []
+    append = values.append
+    for i in range(count):
+        if offset + 1 > data_len:
+            raise ValueError(f"Insufficient data to read column type at offset {offset}")
+
+        col_type = data[offset]
         offset += 1
-        self.key_count = struct.unpack('>H', data[offset:offset+2])[0]
-        offset += 2
-        self.free_space = struct.unpack('>H', data[offset:offset+2])[0]
-        offset += 2
-        # Skip padding (4 bytes)
-        offset += 4
-        self.lsn = struct.unpack('>Q', data[offset:offset+8])[0]
+
+        if col_type == COLUMN_TYPE_INT:
+            if offset + 8 > data_len:
+                raise ValueError(f"Insufficient data to read int at offset {offset}")
+            value = unpack_i64(data, offset)[0]
+            offset += 8
+        elif col_type == COLUMN_TYPE_STRING:
+            if offset + 4 > data_len:
+                raise ValueError(f"Insufficient data to read string length at offset {offset}")
+            length = unpack_u32(data, offset)[0]
+            offset += 4
+            if offset + length > data_len:
+                raise ValueError(f"Insufficient data to read string of length {length} at offset {offset}")
+            # Slice + utf-8 decode is already the fastest option: CPython's utf-8
+            # decoder has an ASCII fast path, and memoryview avoids no copy here
+            value = data[offset:offset+length].decode('utf-8')
+            offset += length
+        elif col_type == COLUMN_TYPE_FLOAT:
+            if offset + 8 > data_len:
+                raise ValueError(f"Insufficient data to read float at offset {offset}")
+            value = unpack_f64(data, offset)[0]
+            offset += 8
+        elif col_type == COLUMN_TYPE_BOOL:
+            if offset + 1 > data_len:
+                raise ValueError(f"Insufficient data to read bool at offset {offset}")
+            value = data[offset] == 1
+            offset += 1
+        else:
+            raise ValueError(f"Unknown column type: {col_type}")
+
+        types[i] = col_type
+        append(value)
+
+    return bytes(types), values, offset
 
 
 def read_column(data: bytes, offset: int) -> Tuple[Column, int]:
     """Read a column from data starting at offset. Returns (Column, new_offset)."""
-    if offset + 1 > len(data):
-        raise ValueError(f"Insufficient data to read column type at offset {offset}")
-    
-    col_type = struct.unpack('>B', data[offset:offset+1])[0]
-    offset += 1
+    types, values, offset = _read_columns(data, offset, 1)
+    return Column(types[0], values[0]), offset
 
-    if col_type == COLUMN_TYPE_INT:
-        if offset + 8 > len(data):
-            raise ValueError(f"Insufficient data to read int at offset {offset}")
-        value = struct.unpack('>q', data[offset:offset+8])[0]
-        offset += 8
-    elif col_type == COLUMN_TYPE_STRING:
-        if offset + 4 > len(data):
-            raise ValueError(f"Insufficient data to read string length at offset {offset}")
-        length = struct.unpack('>I', data[offset:offset+4])[0]
-        offset += 4
-        if offset + length > len(data):
-            raise ValueError(f"Insufficient data to read string of length {length} at offset {offset}")
-        value = data[offset:offset+length].decode('utf-8')
-        offset += length
-    elif col_type == COLUMN_TYPE_FLOAT:
-        if offset + 8 > len(data):
-            raise ValueError(f"Insufficient data to read float at offset {offset}")
-        value = struct.unpack('>d', data[offset:offset+8])[0]
-        offset += 8
-    elif col_type == COLUMN_TYPE_BOOL:
-        if offset + 1 > len(data):
-            raise ValueError(f"Insufficient data to read bool at offset {offset}")
-        value = struct.unpack('>B', data[offset:offset+1])[0] == 1
-        offset += 1
-    else:
-        raise ValueError(f"Unknown column type: {col_type}")
 
-    return Column(col_type, value), offset
+def _read_row(data: bytes, offset: int) -> Tuple[bytes, List[Any], int]:
+    """Read a count-prefixed column list (a key or a record). Returns (types, values, new_offset)."""
+    num_columns = _U32.unpack_from(data, offset)[0]
+    return _read_columns(data, offset + 4, num_columns)
 
 
 def read_composite_key(data: bytes, offset: int) -> Tuple[CompositeKey, int]:
     """Read a CompositeKey from data starting at offset. Returns (CompositeKey, new_offset)."""
-    num_values = struct.unpack('>I', data[offset:offset+4])[0]
-    offset += 4
-
-    values = []
-    for _ in range(num_values):
-        col, offset = read_column(data, offset)
-        values.append(col)
-
-    return CompositeKey(values), offset
+    types, values, offset = _read_row(data, offset)
+    return CompositeKey(types, values), offset
 
 
 def read_record(data: bytes, offset: int) -> Tuple[Record, int]:
     """Read a Record from data starting at offset. Returns (Record, new_offset)."""
-    num_columns = struct.unpack('>I', data[offset:offset+4])[0]
-    offset += 4
+    types, values, offset = _read_row(data, offset)
+    return Record(types, values), offset
+
+
+def _key_str(types: bytes, values: List[Any]) -> str:
+    """Format key values the way str(CompositeKey) does.
+
+    `types` is unused; it is accepted so this can be a _RowReader `make` callback.
+    """
+    return "(" + ", ".join(map(str, values)) + ")"
 
-    columns = []
-    for _ in range(num_columns):
-        col, offset = read_column(data, offset)
-        columns.append(col)
 
-    return Record(columns), offset
+# Whole-row read plans, keyed by the row's type tags
+_FIXED_WIDTH_FORMATS = {COLUMN_TYPE_INT: 'Bq', COLUMN_TYPE_FLOAT: 'Bd', COLUMN_TYPE_BOOL: 'BB'}
+_ROW_PLANS: Dict[bytes, Tuple[Tuple[Tuple[struct.Struct, int, Tuple[int, ...], bool], ...], Tuple[int, ...]]] = {}
+
+
+def _row_plan(types: bytes) -> Tuple[Tuple[Tuple[struct.Struct, int, Tuple[int, ...], bool], ...], Tuple[int, ...]]:
+    """Return (segments, bool column indexes) for reading a count-prefixed row with these column types.
+
+    Each segment is (Struct, first_tag_index, tags, ends_with_string). A segment's
+    Struct reads a run of (tag, value) pairs in one call and, when the run ends in
+    a string column, that column's tag and length; the string bytes follow it.
+    The first segment also reads the column count at index 0.
+    """
+    plan = _ROW_PLANS.get(types)
+    if plan is None:
+        segments = []
+        fmt, tags = '>I', []
+        for t in types:
+            tags.append(t)
+            if t == COLUMN_TYPE_STRING:
+                fmt += 'BI'
+                segments.append((struct.Struct(fmt), 0 if segments else 1, tuple(tags), True))
+                fmt, tags = '>', []
+            else:
+                fmt += _FIXED_WIDTH_FORMATS[t]
+        if fmt != '>':
+            segments.append((struct.Struct(fmt), 0 if segments else 1, tuple(tags), False))
+        bools = tuple(i for i, t in enumerate(types) if t == COLUMN_TYPE_BOOL)
+        plan = _ROW_PLANS[types] = (tuple(segments), bools)
+    return plan
+
+
+class _RowReader:
+    """Reads consecutive count-prefixed rows (keys or records) of one page.
+
+    Rows on a page usually share a type pattern. After each row the reader
+    remembers its pattern and reads the next row with that pattern's plan:
+    one cached Struct call per run of columns up to and including each
+    string length, then the string bytes. The count and every type tag are
+    checked against the pattern as they are read; on any mismatch the row
+    is re-read from the start through _read_row.
+    """
+    __slots__ = ('make', 'types', 'plan')
+
+    def __init__(self, make):
+        self.make = make  # (types, values) -> key/record object
+        self.types = None
+        self.plan = None
+
+    def __call__(self, data: bytes, offset: int) -> Tuple[Any, int]:
+        plan = self.plan
+        if plan is not None:
+            segments, bools = plan
+            data_len = len(data)
+            values = []
+            pos = offset
+            for seg_struct, start, tags, ends_with_string in segments:
+                end = pos + seg_struct.size
+                if end > data_len:
+                    break
+                fields = seg_struct.unpack_from(data, pos)
+                if fields[start::2] != tags or (start and fields[0] != len(self.types)):
+                    break
+                pos = end
+                if ends_with_string:
+                    values.extend(fields[start+1:-1:2])
+                    end = pos + fields[-1]
+                    if end > data_len:
+                        break
+                    values.append(data[pos:end].decode('utf-8'))
+                    pos = end
+                else:
+                    values.extend(fields[start+1::2])
+            else:
+                for i in bools:
+                    values[i] = values[i] == 1
+                return self.make(self.types, values), pos
+
+        types, values, offset = _read_row(data, offset)
+        if types != self.types:
+            self.types = types
+            self.plan = _row_plan(types)
+        return self.make(types, values), offset
 
 
 class MetaPage:
@@ -159,55 +307,55 @@ class MetaPage:
         self.header = header
         # Meta data starts at offset 49 (after 8+8+8+8+1+2+2+4+8 = 49 bytes)
         # But we use the provided offset for flexibility
-        self.root_page = struct.unpack('>Q', data[offset:offset+8])[0]
+        self.root_page = _U64.unpack_from(data, offset)[0]
         offset += 8
-        self.page_size = struct.unpack('>I', data[offset:offset+4])[0]
+        self.page_size = _U32.unpack_from(data, offset)[0]
         offset += 4
-        self.order = struct.unpack('>H', data[offset:offset+2])[0]
+        self.order = _U16.unpack_from(data, offset)[0]
         offset += 2
-        self.version = struct.unpack('>H', data[offset:offset+2])[0]
+        self.version = _U16.unpack_from(data, offset)[0]
 
 
 class InternalPage:
-    def __init__(self, header: PageHeader, data: bytes, offset: int):
+    def __init__(self, header: PageHeader, data: bytes, offset: int, keys_as_str: bool = False):
         self.header = header
-        self.keys = []
-        self.children = []
+        self.keys = [None] * header.key_count
 
-        # Read keys
-        for _ in range(header.key_count):
-            key, offset = read_composite_key(data, offset)
-            self.keys.append(key)
+        # Read keys (as display strings when nothing but printing needs them)
+        read_key = _RowReader(_key_str if keys_as_str else CompositeKey)
+        for i in range(header.key_count):
+            self.keys[i], offset = read_key(data, offset)
 
-        # Read children (key_count + 1)
-        for _ in range(header.key_count + 1):
-            child_id = struct.unpack('>Q', data[offset:offset+8])[0]
-            offset += 8
-            self.children.append(child_id)
+        # Read children (key_count + 1) in one unpack; the tuple is kept as-is
+        self.children = _child_ids_struct(header.key_count + 1).unpack_from(data, offset)
 
 
 class LeafPage:
-    def __init__(self, header: PageHeader, data: bytes, offset: int):
+    def __init__(self, header: PageHeader, data: bytes, offset: int, keys_as_str: bool = False,
+                 max_values: Optional[int] = None):
         self.header = header
-        self.keys = []
-        self.values = []
+        self.keys = [None] * header.key_count
+        # Values follow all keys, so any beyond max_values are simply left unread;
+        # header.key_count still gives the total
+        num_values = header.key_count if max_values is None else min(max_values, header.key_count)
+        self.values = [None] * num_values
 
-        # Read keys
-        for _ in range(header.key_count):
-            key, offset = read_composite_key(data, offset)
-            self.keys.append(key)
+        # Read keys (as display strings when nothing but printing needs them)
+        read_key = _RowReader(_key_str if keys_as_str else CompositeKey)
+        for i in range(header.key_count):
+            self.keys[i], offset = read_key(data, offset)
 
         # Read values
-        for _ in range(header.key_count):
-            value, offset = read_record(data, offset)
-            self.values.append(value)
+        read_value = _RowReader(Record)
+        for i in range(num_values):
+            self.values[i], offset = read_value(data, offset)
 
 
-def read_page(file, page_id: int, page_size: int) -> Optional[Any]:
-    """Read a page from the file. Returns MetaPage, InternalPage, LeafPage, or None."""
+def read_page(buf, page_id: int, page_size: int, keys_as_str: bool = False,
+              max_values: Optional[int] = None) -> Optional[Any]:
+    """Read a page from a file buffer (e.g. an mmap). Returns MetaPage, InternalPage, LeafPage, or None."""
     offset = (page_id - 1) * page_size
-    file.seek(offset)
-    data = file.read(page_size)
+    data = buf[offset:offset+page_size]
 
     if len(data) < PAGE_HEADER_SIZE:
         return None
@@ -227,9 +375,9 @@ def read_page(file, page_id: int, page_size: int) -> Optional[Any]:
         if header.page_type == PAGE_TYPE_META:
             return MetaPage(header, data, payload_offset)
         elif header.page_type == PAGE_TYPE_INTERNAL:
-            return InternalPage(header, data, payload_offset)
+            return InternalPage(header, data, payload_offset, keys_as_str)
         elif header.page_type == PAGE_TYPE_LEAF:
-            return LeafPage(header, data, payload_offset)
+            return LeafPage(header, data, payload_offset, keys_as_str, max_values)
         else:
             return None
     except (struct.error, ValueError, IndexError) as e:
@@ -237,37 +385,86 @@ def read_page(file, page_id: int, page_size: int) -> Optional[Any]:
         return None
 
 
-def build_tree_structure(file_path: str) -> Tuple[Dict[int, Any], Optional[int]]:
-    """Read all pages from the file and build a tree structure."""
+def _prefetch_pages(mm: mmap.mmap, page_ids: List[int], page_size: int):
+    """Ask the kernel to start reading the given pages in the background (no-op where unsupported)."""
+    if not hasattr(mmap, 'MADV_WILLNEED'):
+        return
+    mm_len = len(mm)
+    for page_id in page_ids:
+        start = (page_id - 1) * page_size
+        if page_id < 1 or start >= mm_len:
+            continue
+        # madvise needs an offset aligned to the OS page size
+        aligned = start - start % mmap.PAGESIZE
+        mm.madvise(mmap.MADV_WILLNEED, aligned, min(start + page_size, mm_len) - aligned)
+
+
+def build_tree_structure(file_path: str, keys_as_str: bool = False,
+                         max_values: Optional[int] = None) -> Tuple[Dict[int, Any], Optional[int]]:
+    """Read the meta page and every page reachable from the root, level by level.
+
+    With keys_as_str, page keys are decoded straight to their display strings
+    instead of CompositeKey objects. With max_values, only the first max_values
+    records of each leaf are decoded.
+    """
     pages = {}
     root_id = None
 
     with open(file_path, 'rb') as f:
-        # Read meta page first
-        meta = read_page(f, 1, DEFAULT_PAGE_SIZE)
-        if meta and isinstance(meta, MetaPage):
-            pages[1] = meta
-            root_id = meta.root_page
-
-        # Read all other pages
-        f.seek(0, 2)  # Seek to end
-        file_size = f.tell()
-        num_pages = file_size // DEFAULT_PAGE_SIZE
-
-        for page_id in range(2, num_pages + 1):
-            page = read_page(f, page_id, DEFAULT_PAGE_SIZE)
-            if page:
-                pages[page_id] = page
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size == 0:
+            # mmap cannot map an empty file
+            return pages, root_id
+
+        # Map the file once and slice pages out of it instead of seek+read per page
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if file_size // DEFAULT_PAGE_SIZE > RANDOM_ACCESS_MIN_PAGES and hasattr(mmap, 'MADV_RANDOM'):
+                mm.madvise(mmap.MADV_RANDOM)
+
+            # Read meta page first
+            meta = read_page(mm, 1, DEFAULT_PAGE_SIZE)
+            if meta and isinstance(meta, MetaPage):
+                pages[1] = meta
+                root_id = meta.root_page
+
+            # Walk the tree one level at a time. All pages of the next level are
+            # known before any of them is parsed, so they are prefetched together
+            # and the disk reads overlap instead of being issued one by one.
+            level = [root_id] if root_id else []
+            while level:
+                _prefetch_pages(mm, level, DEFAULT_PAGE_SIZE)
+                next_level = []
+                for page_id in level:
+                    if page_id == 0 or page_id in pages:
+                        continue
+                    page = read_page(mm, page_id, DEFAULT_PAGE_SIZE, keys_as_str, max_values)
+                    if page:
+                        pages[page_id] = page
+                        if isinstance(page, InternalPage):
+                            next_level.extend(page.children)
+                level = next_level
 
     return pages, root_id
 
 
-def visualize_tree(pages: Dict[int, Any], root_id: Optional[int], output_file: str):
-    """Visualize the B+Tree structure and write to output file as an image."""
+def visualize_tree(pages: Dict[int, Any], root_id: Optional[int], output_file: str) -> str:
+    """Visualize the B+Tree structure and write to output file as an image.
+
+    Returns the path actually written, which may differ from output_file when
+    the extension is adjusted or the text renderer is used instead.
+    """
     if not HAS_MATPLOTLIB:
         # Fallback to text output if matplotlib is not available
         visualize_tree_text(pages, root_id, output_file)
-        return
+        return output_file
+    
+    if len(pages) > MAX_RENDER_PAGES:
+        # Too large to draw usefully; write the text tree next to the requested image
+        print(f"Warning: {len(pages)} pages exceeds {MAX_RENDER_PAGES}, writing text visualization instead",
+              file=sys.stderr)
+        output_file = os.path.splitext(output_file)[0] + '.txt'
+        visualize_tree_text(pages, root_id, output_file)
+        return output_file
     
     # Determine output format from file extension
     output_ext = os.path.splitext(output_file)[1].lower()
@@ -284,39 +481,41 @@ def visualize_tree(pages: Dict[int, Any], root_id: Optional[int], output_file: s
         plt.tight_layout()
         plt.savefig(output_file, dpi=150, bbox_inches='tight')
         plt.close()
-        return
+        return output_file
     
     # Build tree layout using a better algorithm
     node_positions = {}
-    node_levels = {}
+    level_groups: Dict[int, List[int]] = {}  # Node ids per level, left to right
     max_level = 0
     x_positions = {}  # Track x positions for each level
     
-    def get_level_width(level: int) -> int:
-        """Count nodes at a given level."""
-        count = 0
-        for node_id, page in pages.items():
-            if node_id == 1:  # Skip meta page
-                continue
-            if node_id in node_levels and node_levels[node_id] == level:
-                count += 1
-        return count
-    
-    def calculate_layout(node_id: int, level: int):
-        """Calculate layout recursively."""
-        nonlocal max_level
-        if node_id == 0 or node_id not in pages:
-            return
+    # Walk the tree iteratively: a preorder pass assigns levels and records
+    # the postorder, then the postorder pass positions children before parents
+    postorder = []
+    visited = set()  # Each page is laid out once, even if a corrupt file links it twice
+    stack = [(root_id, 0, False)]
+    while stack:
+        node_id, level, expanded = stack.pop()
+        if expanded:
+            postorder.append((node_id, level))
+            continue
+        if node_id == 0 or node_id not in pages or node_id in visited:
+            continue
         
-        page = pages[node_id]
-        node_levels[node_id] = level
+        visited.add(node_id)
+        level_groups.setdefault(level, []).append(node_id)
         max_level = max(max_level, level)
-        
+        stack.append((node_id, level, True))
+        page = pages[node_id]
+        if isinstance(page, InternalPage):
+            # Push right to left so children are visited left to right
+            for child_id in reversed(page.children):
+                if child_id not in visited:
+                    stack.append((child_id, level + 1, False))
+    
+    for node_id, level in postorder:
+        page = pages[node_id]
         if isinstance(page, InternalPage):
-            # First, layout all children
-            for child_id in page.children:
-                calculate_layout(child_id, level + 1)
-            
             # Position this node in the middle of its children
             if page.children:
                 child_positions = [node_positions.get(cid, (0, 0))[0] 
@@ -337,37 +536,23 @@ def visualize_tree(pages: Dict[int, Any], root_id: Optional[int], output_file: s
         
         node_positions[node_id] = (node_x, -level)
     
-    # Calculate layout starting from root
-    calculate_layout(root_id, 0)
-    
-    # Normalize and spread out positions
-    if node_positions:
-        # Group by level and normalize
-        level_groups = {}
-        for node_id, (x, y) in node_positions.items():
-            level = int(-y)
-            if level not in level_groups:
-                level_groups[level] = []
-            level_groups[level].append((node_id, x))
-        
-        # Normalize each level
-        for level, nodes in level_groups.items():
-            if len(nodes) > 1:
-                xs = [x for _, x in nodes]
-                min_x, max_x = min(xs), max(xs)
-                if max_x > min_x:
-                    for node_id, x in nodes:
-                        normalized_x = (x - min_x) / (max_x - min_x) * 9 + 0.5
-                        node_positions[node_id] = (normalized_x, -level)
-                else:
-                    # Spread evenly if all same x
-                    spacing = 9.0 / len(nodes)
-                    for i, (node_id, _) in enumerate(nodes):
-                        node_positions[node_id] = (0.5 + i * spacing, -level)
+    # Normalize and spread out positions, one level at a time
+    for level, nodes in level_groups.items():
+        if len(nodes) > 1:
+            xs = [node_positions[node_id][0] for node_id in nodes]
+            min_x, max_x = min(xs), max(xs)
+            if max_x > min_x:
+                for node_id, x in zip(nodes, xs):
+                    normalized_x = (x - min_x) / (max_x - min_x) * 9 + 0.5
+                    node_positions[node_id] = (normalized_x, -level)
             else:
-                # Single node at level, center it
-                node_id, _ = nodes[0]
-                node_positions[node_id] = (5.0, -level)
+                # Spread evenly if all same x
+                spacing = 9.0 / len(nodes)
+                for i, node_id in enumerate(nodes):
+                    node_positions[node_id] = (0.5 + i * spacing, -level)
+        else:
+            # Single node at level, center it
+            node_positions[nodes[0]] = (5.0, -level)
     
     # Create figure with better sizing
     fig_width = 16
@@ -378,16 +563,18 @@ def visualize_tree(pages: Dict[int, Any], root_id: Optional[int], output_file: s
     ax.axis('off')
     ax.set_facecolor('#FAFAFA')
     
-    # Draw edges first
+    # Collect edges and node boxes so each kind is drawn as a single collection
+    edge_segments = []
+    internal_patches = []
+    leaf_patches = []
     for node_id, (x, y) in node_positions.items():
         page = pages[node_id]
         if isinstance(page, InternalPage):
             for child_id in page.children:
                 if child_id in node_positions:
-                    child_x, child_y = node_positions[child_id]
-                    ax.plot([x, child_x], [y, child_y], 'k-', linewidth=1.5, alpha=0.6, zorder=1)
+                    edge_segments.append([(x, y), node_positions[child_id]])
     
-    # Draw nodes
+    # Draw node labels and collect node boxes
     for node_id, (x, y) in node_positions.items():
         page = pages[node_id]
         
@@ -400,10 +587,8 @@ def visualize_tree(pages: Dict[int, Any], root_id: Optional[int], output_file: s
             # Adjust box size based on content
             box_width = min(1.2, max(0.8, len(keys_str) * 0.08))
             box_height = 0.4
-            box = FancyBboxPatch((x-box_width/2, y-box_height/2), box_width, box_height, 
-                                boxstyle="round,pad=0.08", 
-                                facecolor='#E3F2FD', edgecolor='#1976D2', linewidth=2.5)
-            ax.add_patch(box)
+            internal_patches.append(FancyBboxPatch((x-box_width/2, y-box_height/2), box_width, box_height, 
+                                                   boxstyle="round,pad=0.08"))
             ax.text(x, y, label, ha='center', va='center', fontsize=9, weight='bold', 
                    family='monospace')
         
@@ -412,9 +597,9 @@ def visualize_tree(pages: Dict[int, Any], root_id: Optional[int], output_file: s
             keys_str = ", ".join(str(k) for k in page.keys[:4])  # Show first 4 keys
             if len(page.keys) > 4:
                 keys_str += f" ... ({len(page.keys)} total)"
-            values_str = ", ".join(str(v) for v in page.values[:3])  # Show first 3 values
-            if len(page.values) > 3:
-                values_str += f" ... ({len(page.values)} total)"
+            values_str = ", ".join(str(v) for v in page.values[:LEAF_VALUES_SHOWN])
+            if page.header.key_count > LEAF_VALUES_SHOWN:
+                values_str += f" ... ({page.header.key_count} total)"
             
             # Truncate long strings
             if len(keys_str) > 50:
@@ -425,13 +610,19 @@ def visualize_tree(pages: Dict[int, Any], root_id: Optional[int], output_file: s
             label = f"Page {node_id} [LEAF]\nKeys: {keys_str}\nValues: {values_str}"
             box_width = min(1.4, max(1.0, max(len(keys_str), len(values_str)) * 0.08))
             box_height = 0.5
-            box = FancyBboxPatch((x-box_width/2, y-box_height/2), box_width, box_height, 
-                                boxstyle="round,pad=0.08", 
-                                facecolor='#E8F5E9', edgecolor='#388E3C', linewidth=2.5)
-            ax.add_patch(box)
+            leaf_patches.append(FancyBboxPatch((x-box_width/2, y-box_height/2), box_width, box_height, 
+                                               boxstyle="round,pad=0.08"))
             ax.text(x, y, label, ha='center', va='center', fontsize=8, weight='bold',
                    family='monospace')
     
+    # Edges go underneath the boxes (both at zorder 1, edges added first);
+    # labels are drawn on top at the Text default zorder
+    ax.add_collection(LineCollection(edge_segments, colors='k', linewidths=1.5, alpha=0.6, zorder=1))
+    ax.add_collection(PatchCollection(internal_patches, facecolor='#E3F2FD', edgecolor='#1976D2',
+                                      linewidth=2.5, zorder=1))
+    ax.add_collection(PatchCollection(leaf_patches, facecolor='#E8F5E9', edgecolor='#388E3C',
+                                      linewidth=2.5, zorder=1))
+    
     # Add title
     title = "B+Tree Visualization"
     if meta and isinstance(meta, MetaPage):
@@ -441,60 +632,86 @@ def visualize_tree(pages: Dict[int, Any], root_id: Optional[int], output_file: s
     plt.tight_layout()
     plt.savefig(output_file, dpi=150, bbox_inches='tight')
     plt.close()
+    return output_file
 
 
 def visualize_tree_text(pages: Dict[int, Any], root_id: Optional[int], output_file: str):
     """Fallback text visualization if matplotlib is not available."""
-    with open(output_file, 'w') as f:
-        meta = pages.get(1)
-        if meta and isinstance(meta, MetaPage):
-            f.write("B+Tree Visualization\n")
-            f.write(f"Meta: root={meta.root_page} order={meta.order} "
+    # Lines are collected and written with a single call at the end
+    out = []
+    meta = pages.get(1)
+    if meta and isinstance(meta, MetaPage):
+        out.append("B+Tree Visualization\n")
+        out.append(f"Meta: root={meta.root_page} order={meta.order} "
                    f"pageSize={meta.page_size} version={meta.version}\n\n")
 
-        if root_id is None or root_id == 0:
-            f.write("(Empty tree)\n")
-            return
-
-        def print_node(node_id: int, prefix: str, is_last: bool, is_root: bool = False):
+    if root_id is None or root_id == 0:
+        out.append("(Empty tree)\n")
+    else:
+        # Depth-first walk with an explicit stack: (node_id, prefix, is_last, is_root)
+        stack = [(root_id, "", True, True)]
+        printed = set()  # Guards against child links that loop back in a corrupt file
+        while stack:
+            node_id, prefix, is_last, is_root = stack.pop()
             if node_id == 0 or node_id not in pages:
-                return
+                continue
             page = pages[node_id]
             connector = "`-- " if (is_last and not is_root) else "+-- " if not is_root else ""
             next_prefix = prefix + ("    " if is_last else "|   ")
 
+            if node_id in printed:
+                out.append(f"{prefix}{connector}[{node_id}] (already shown above)\n")
+                continue
+            printed.add(node_id)
+
             if isinstance(page, InternalPage):
                 keys_str = "[" + ", ".join(str(k) for k in page.keys) + "]"
                 children_str = "[" + ", ".join(str(c) for c in page.children) + "]"
-                f.write(f"{prefix}{connector}[I {node_id}] keys {keys_str} "
-                       f"children={children_str}\n")
-                for i, child_id in enumerate(page.children):
-                    is_last_child = (i == len(page.children) - 1)
-                    print_node(child_id, next_prefix, is_last_child)
+                out.append(f"{prefix}{connector}[I {node_id}] keys {keys_str} "
+                           f"children={children_str}\n")
+                # Push right to left so children are printed left to right
+                last = len(page.children) - 1
+                for i in range(last, -1, -1):
+                    stack.append((page.children[i], next_prefix, i == last, False))
             elif isinstance(page, LeafPage):
                 keys_str = "[" + ", ".join(str(k) for k in page.keys) + "]"
                 values_str = "[" + ", ".join(str(v) for v in page.values) + "]"
-                f.write(f"{prefix}{connector}[L {node_id}] keys {keys_str} "
-                       f"values {values_str}\n")
+                out.append(f"{prefix}{connector}[L {node_id}] keys {keys_str} "
+                           f"values {values_str}\n")
 
-        print_node(root_id, "", True, is_root=True)
+    with open(output_file, 'w') as f:
+        f.write("".join(out))
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 visualize_tree.py <database_file.db> [output_file.png]")
+    # --text skips matplotlib and writes the text tree
+    args = [a for a in sys.argv[1:] if a != '--text']
+    text_mode = len(args) != len(sys.argv) - 1
+
+    if len(args) < 1:
+        print("Usage: python3 visualize_tree.py [--text] <database_file.db> [output_file.png]")
         sys.exit(1)
 
-    db_file = sys.argv[1]
+    db_file = args[0]
     if not os.path.exists(db_file):
         print(f"Error: Database file '{db_file}' not found")
         sys.exit(1)
 
-    output_file = sys.argv[2] if len(sys.argv) > 2 else db_file + ".png"
+    output_file = args[1] if len(args) > 1 else db_file + (".txt" if text_mode else ".png")
 
     try:
-        pages, root_id = build_tree_structure(db_file)
-        visualize_tree(pages, root_id, output_file)
+        # Both renderers only print keys, so skip building CompositeKey objects.
+        # The image shows only the first few values of each leaf, so leave the rest
+        # unread when an image will be drawn. A file within MAX_RENDER_PAGES cannot
+        # reach visualize_tree's text fallback, so text output always gets every value.
+        will_draw = (not text_mode and HAS_MATPLOTLIB
+                     and os.path.getsize(db_file) // DEFAULT_PAGE_SIZE <= MAX_RENDER_PAGES)
+        max_values = LEAF_VALUES_SHOWN if will_draw else None
+        pages, root_id = build_tree_structure(db_file, keys_as_str=True, max_values=max_values)
+        if text_mode:
+            visualize_tree_text(pages, root_id, output_file)
+        else:
+            output_file = visualize_tree(pages, root_id, output_file)
         print(f"Tree visualization written to: {output_file}")
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)